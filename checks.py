@@ -1,7 +1,9 @@
 #pylint: disable=invalid-name
 
 import argparse
+import copy
 import datetime as dt
+import functools
 import os
 
 import yaml
@@ -31,8 +33,7 @@ def load_config_section(arg):
     section_name = arg[1] if len(arg) == 2 else None
 
     # Load the YAML file into a dictionary
-    with open(file_name, 'r') as fn:
-        cfg = yaml.load(fn, Loader=yaml.Loader)
+    cfg = read_yaml(file_name, yaml.Loader)
 
     err_msg = 'Section {section_name} does not exist in top level of {file_name}'
     if section_name:
@@ -62,10 +63,22 @@ def load_config_file(arg):
     arg = file_exists(arg)
 
     # Load the yaml config and return the Python dict
-    with open(arg, 'r') as fn:
-        ret = yaml.safe_load(fn)
+    return read_yaml(arg, yaml.SafeLoader)
+
+def read_yaml(file_name, loader):
+
+    '''
+    Returns a copy of the Python object in a YAML file. Each file is only
+    parsed once per process, so callers are free to modify the result.
+    '''
+
+    return copy.deepcopy(_parse_yaml(os.path.abspath(file_name), loader))
 
-    return ret
+@functools.lru_cache(maxsize=None)
+def _parse_yaml(file_name, loader):
+
+    with open(file_name, 'r') as fn:
+        return yaml.load(fn, Loader=loader)
 
 def load_str(arg):
 
@@ -9,5 +9,20 @@ class DirectoryExists(Error):
 class FileNotFound(Error):
     pass
 
+class PathNotFound(Error):
+    pass
+
+class ChecksumMismatch(Error):
+    pass
+
+class IncompleteCopy(Error):
+    pass
+
 class InvalidConfigSetting(Error):
     pass
+
+class PreflightError(Error):
+    pass
+
+class PostProcessingError(Error):
+    pass
@@ -1,7 +1,12 @@
 # pylint: disable=invalid-name,no-member,too-many-arguments
 
 from argparse import Namespace
+import copy
+import datetime as dt
+import functools
+import glob
 import os
+import re
 import shlex
 import shutil
 import subprocess
@@ -12,7 +17,26 @@ import yaml
 import f90nml
 
 import errors
+from lbc import BoundaryStager
+import preflight
 import utils
+from watcher import OutputWatcher
+
+@functools.lru_cache(maxsize=None)
+def load_nml(path):
+
+    ''' Returns the parsed namelist at path. Parsed once per process; do not modify. '''
+
+    with open(path, 'r') as nml_file:
+        return f90nml.read(nml_file)
+
+@functools.lru_cache(maxsize=None)
+def load_template(path):
+
+    ''' Returns the Jinja template at path. Parsed once per process. '''
+
+    with open(path, 'r') as tmpl_file:
+        return j2.Template(tmpl_file.read())
 
 class BatchJob():
 
@@ -21,6 +45,7 @@ class BatchJob():
         self.config = self.config_namespace(config)
         self.machine = self.config_namespace(machine)
         self.starttime = starttime
+        self.process = None
 
         overwrite = kwargs.get('overwrite', False)
         self.workdir = self.create_workdir(overwrite)
@@ -71,14 +96,7 @@ class BatchJob():
         files = []
         for path_name, filelist in links.items():
 
-            path_dir = vars(n.paths).get(
-                path_name,
-                vars(self.machine.dirs).get(path_name),
-                )
-
-            if not path_dir:
-                msg = f'stage_files: cannot find a path entry for {path_name}'
-                raise ValueError(msg)
+            path_dir = self.stage_path(path_name)
 
             for src_dst in filelist:
 
@@ -93,13 +111,34 @@ class BatchJob():
                 # Add the processed src_dst to the filelist
                 files.append((filepath, destination))
 
-        for src, dst in files:
-            if action == 'link':
+        if action == 'link':
+            for src, dst in files:
                 print(f'Linking {src.format(n=n, starttime=starttime)} to {dst}')
                 utils.safe_link(src.format(n=n, starttime=starttime), dst)
-            if action == 'copy':
-                print(f'Copying {src.format(n=n, starttime=starttime)} to {dst}')
-                utils.safe_copy(src.format(n=n, starttime=starttime), dst)
+
+        if action == 'copy':
+            # Large files are copied concurrently
+            staging = vars(n).get('staging')
+            utils.copy_files(
+                [(src.format(n=n, starttime=starttime), dst) for src, dst in files],
+                workers=staging.copy_workers if staging else 4,
+                checksum=staging.checksum if staging else None,
+                )
+
+    def stage_path(self, path_name):
+
+        ''' Returns the unformatted path for a section header in a file list. '''
+
+        path_dir = vars(self.config.paths).get(
+            path_name,
+            vars(self.machine.dirs).get(path_name),
+            )
+
+        if not path_dir:
+            msg = f'stage_files: cannot find a path entry for {path_name}'
+            raise ValueError(msg)
+
+        return path_dir
 
     @staticmethod
     def create_yml(outfile, settings):
@@ -111,8 +150,7 @@ class BatchJob():
     @staticmethod
     def render_template(outfile, template, tmpl_vars):
 
-        with open(template, 'r') as tmpl_file:
-            template = j2.Template(tmpl_file.read())
+        template = load_template(template)
 
         xml_contents = template.render(**tmpl_vars)
 
@@ -127,16 +165,23 @@ class BatchJob():
 
         run_cmd = self.machine.run_command.format(n=self.config)
         cmd = shlex.split(f'{run_cmd} {exe}')
-        pc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE)
 
-        while True:
-            output = pc.stdout.readline()
-            if not output and pc.poll():
-                break
-            if output:
-                print(output.strip())
+        # Keep a handle on the launcher so that helpers running alongside the
+        # model can signal it.
+        self.process = subprocess.Popen(
+            cmd,
+            cwd=self.workdir,
+            stdout=subprocess.PIPE,
+            universal_newlines=True,
+            )
+
+        for output in self.process.stdout:
+            print(output.strip())
+
+        rc = self.process.wait()
+        if rc != 0:
+            raise subprocess.CalledProcessError(rc, cmd)
 
-        rc = pc.poll()
         return rc
 
 
@@ -146,6 +191,9 @@ class Forecast(BatchJob):
 
         BatchJob.__init__(self, config, machine, starttime, **kwargs)
 
+        # Post-processes history files while the model runs, if configured
+        self.watcher = None
+
         # Set of configuration Namespace objects.
         grid = self.config_namespace(kwargs.get('grid'))
         self.grid = grid
@@ -188,9 +236,252 @@ class Forecast(BatchJob):
         # Create input.nml
         self.create_nml()
 
-        # Run the forecast
+        # Run the forecast, post-processing output files as they complete and
+        # staging boundary files that did not exist at launch
         if not dry_run:
-            self.parallel_run(self.config.static.copy.fv3_exec[0])
+            # The model cannot start without the first two boundary files
+            stager = self.boundary_stager()
+            if stager:
+                stager.wait_for_launch(self.config.lbc.launch_timeout)
+
+            watcher = self.watcher = self.output_watcher()
+            if watcher:
+                watcher.start()
+
+            if stager:
+                stager.start()
+
+            success = False
+            try:
+                self.run_with_recovery(self.config.static.copy.fv3_exec[0][-1])
+                success = True
+            finally:
+                if stager:
+                    stager.stop()
+                if watcher:
+                    post_results = watcher.stop(final=success)
+
+            # Only reached when the forecast succeeded
+            if watcher:
+                failed = [f'{path} (return code {rc})' for path, rc in post_results if rc != 0]
+                if failed:
+                    msg = ('run: post-processing failed for:\n  ' + '\n  '.join(failed)
+                           + '\nRerun to retry them.')
+                    raise errors.PostProcessingError(msg)
+
+    def run_with_recovery(self, exe):
+
+        '''
+        Run the executable, and when it fails, relaunch it from the newest
+        complete restart set in RESTART up to recovery.max_retries times.
+        '''
+
+        max_retries = self.config.recovery.max_retries
+        attempt = 0
+        while True:
+            self.preflight()
+            try:
+                return self.parallel_run(exe)
+            except subprocess.CalledProcessError as err:
+                if attempt >= max_retries:
+                    raise
+                attempt += 1
+                print(f'{exe} failed with return code {err.returncode}. '
+                      f'Recovery attempt {attempt} of {max_retries}.')
+                if not self.warm_restart():
+                    raise
+
+    def restart_sets(self):
+
+        '''
+        Returns a dict of the candidate restart sets in RESTART, keyed by their
+        valid time: those with every file listed in recovery.restart_files
+        under the YYYYMMDD.HHMMSS. prefix the model writes at each
+        restart_interval. Use restart_set_problems to check that a set was
+        written completely.
+        '''
+
+        restart_dir = os.path.join(self.workdir, 'RESTART')
+        required = self.config.recovery.restart_files
+
+        prefixes = set()
+        for fname in os.listdir(restart_dir):
+            match = re.match(r'(\d{8}\.\d{6})\.', fname)
+            if match:
+                prefixes.add(match.group(1))
+
+        sets = {}
+        for prefix in prefixes:
+            paths = [os.path.join(restart_dir, f'{prefix}.{fname}') for fname in required]
+            if all(os.path.exists(path) for path in paths):
+                sets[dt.datetime.strptime(prefix, '%Y%m%d.%H%M%S')] = paths
+
+        return sets
+
+    def restart_set_problems(self, paths):
+
+        '''
+        Returns a list of problems with the files of a restart set, e.g. those
+        left truncated by a failure while the set was being written. NetCDF
+        files are checked with preflight.check_file, and coupler.res must hold
+        the model start time.
+        '''
+
+        problems = []
+        nc_files = {}
+        for path in paths:
+            if path.endswith('.nc'):
+                nc_files[path] = None
+            else:
+                try:
+                    self.coupler_start_time(path)
+                except (OSError, ValueError, IndexError, TypeError) as err:
+                    problems.append(f'{path}: cannot read model start time ({err})')
+
+        pre = vars(self.config).get('preflight')
+        workers = pre.workers if pre else 8
+        return problems + preflight.check_files(nc_files, workers=workers)
+
+    def warm_restart(self):
+
+        '''
+        Stage the newest valid restart set into INPUT, and rewrite
+        model_configure and input.nml for a warm continuation. Sets are tried
+        from newest to oldest, skipping any that fail restart_set_problems.
+        History files from beyond the chosen set are discarded from the output
+        watcher. Returns False if there is no restart set to continue from.
+        '''
+
+        sets = self.restart_sets()
+
+        valid_time = None
+        for set_time in sorted(sets, reverse=True):
+            problems = self.restart_set_problems(sets[set_time])
+            if not problems:
+                valid_time = set_time
+                break
+            print(f'warm_restart: skipping restart set valid at {set_time}:\n  '
+                  + '\n  '.join(problems))
+
+        if valid_time is None:
+            print('warm_restart: no complete restart set found in RESTART. '
+                  'Is restart_interval set?')
+            return False
+
+        print(f'warm_restart: continuing from restart set valid at {valid_time}')
+
+        for src in sets[valid_time]:
+            # Drop the YYYYMMDD.HHMMSS. prefix for the name the model reads
+            dst = os.path.join(self.workdir, 'INPUT', os.path.basename(src).split('.', 2)[-1])
+            if os.path.lexists(dst):
+                os.remove(dst)
+            print(f'Linking {src} to {dst}')
+            utils.safe_link(src, dst)
+
+        # The model start time comes from coupler.res, so that forecast hours
+        # (and history file names) continue from the original initial time.
+        self.starttime = self.coupler_start_time(
+            os.path.join(self.workdir, 'INPUT', 'coupler.res'))
+        self.create_model_config()
+
+        # History files past the restart time will be written again, so any
+        # the failed attempt left, perhaps incomplete, must not be kept as done.
+        if self.watcher:
+            self.watcher.discard_after((valid_time - self.starttime) / dt.timedelta(hours=1))
+
+        utils.update_dict(self.nml, utils.to_dict(self.config.recovery.namelist), quiet=True)
+        self.create_nml()
+
+        return True
+
+    @staticmethod
+    def coupler_start_time(coupler_res):
+
+        ''' Returns the model start time recorded in a coupler.res file. '''
+
+        with open(coupler_res, 'r') as fn:
+            lines = fn.readlines()
+
+        fields = [int(f) for f in lines[1].split()[:6]]
+        return dt.datetime(*fields)
+
+    def preflight(self):
+
+        '''
+        Check the headers of the NetCDF files in INPUT for truncation, and for
+        the dimensions set for each file in the preflight config section.
+        Raises PreflightError listing every problem found.
+        '''
+
+        pre = vars(self.config).get('preflight')
+        if not pre or not pre.enabled:
+            return
+
+        fmt_vars = {'n': self.config, 'g': self.grid}
+
+        problems = []
+        files = {path: None for path in glob.glob(os.path.join(self.workdir, 'INPUT', '*.nc'))}
+        for fname, dims in vars(pre.dimensions).items():
+            path = os.path.join(self.workdir, fname.format(**fmt_vars))
+            if path not in files:
+                continue
+            try:
+                files[path] = {}
+                for name, length in vars(dims).items():
+                    files[path][name] = int(eval("f'{}'".format(length), {}, fmt_vars))
+            except AttributeError as err:
+                files[path] = None
+                problems.append(f'{path}: dimensions not checked ({err})')
+
+        problems += preflight.check_files(files, workers=pre.workers)
+        if problems:
+            msg = 'preflight: problems with INPUT files:\n  ' + '\n  '.join(problems)
+            raise errors.PreflightError(msg)
+
+        print(f'preflight: {len(files)} INPUT files passed')
+
+    def history_patterns(self):
+
+        ''' Returns glob patterns for the history files named in model_config. '''
+
+        model_config = {}
+        for item in self.config.model_config:
+            if isinstance(item, dict):
+                model_config.update(item)
+
+        ext = 'nc' if model_config.get('output_file', 'netcdf') == 'netcdf' else 'nemsio'
+        return [f'{base}f*.{ext}' for base in
+                model_config.get('filename_base', 'dyn phy').split()]
+
+    def output_watcher(self):
+
+        '''
+        Returns an OutputWatcher for the history files named by filename_base
+        and output_file in model_config, or None if no post-processing command
+        is configured.
+        '''
+
+        post = vars(self.config).get('post_processing')
+        if not post or not post.command:
+            return None
+
+        record = post.record.format(
+            n=self.config,
+            cycle=self.starttime.strftime('%Y%m%d%H'),
+            )
+        os.makedirs(os.path.dirname(record), exist_ok=True)
+
+        return OutputWatcher(
+            self.workdir,
+            self.history_patterns(),
+            post.command,
+            record,
+            marker=post.marker,
+            max_workers=post.max_workers,
+            poll_interval=post.poll_interval,
+            stable_polls=post.stable_polls,
+            fmt_vars={'n': self.config},
+            )
 
     def create_diag_table(self):
 
@@ -283,8 +574,7 @@ class Forecast(BatchJob):
         fv3_nml = os.path.join(self.workdir, 'input.nml')
 
         # Read in the namelist that has all the base settings.
-        with open(self.config.paths.base_nml.format(n=self.config), 'r') as nml_file:
-            base_nml = f90nml.read(nml_file)
+        base_nml = copy.deepcopy(load_nml(self.config.paths.base_nml.format(n=self.config)))
 
 
         # Update the base namelist with settings for the current configuration
@@ -295,6 +585,104 @@ class Forecast(BatchJob):
         with open(fv3_nml, 'w') as fn:
             base_nml.write(fn)
 
+    def lbc_interval(self):
+
+        ''' Returns bc_update_interval (hours) from the final namelist. '''
+
+        interval = self.nml.get('fv_core_nml', {}).get('bc_update_interval')
+        if interval is None:
+            interval = self.config.namelist.fv_core_nml.bc_update_interval
+
+        return int(interval)
+
+    def lbc_times(self):
+
+        '''
+        Returns the boundary hours needed by the forecast: every
+        bc_update_interval from 0 through the first one at or beyond
+        nhours_fcst.
+        '''
+
+        interval = self.lbc_interval()
+        last = -(-int(self.config.nhours_fcst) // interval) * interval
+        return list(range(0, last + 1, interval))
+
+    def lbc_source(self, hour):
+
+        ''' Returns the full path of the source boundary file for hour. '''
+
+        lbc = self.config.lbc
+        path_dir = self.stage_path(lbc.source).format(
+            n=self.config,
+            starttime=self.starttime.strftime('%Y%m%d%H'),
+            )
+        return os.path.join(path_dir, f'gfs_bndy.tile{self.config.tile}.{hour:03d}.nc')
+
+    def lbc_files(self):
+
+        '''
+        A "callable" used by stage_all. Must return a list of lists.
+        Returns the boundary files for each time in lbc_times, as full paths in
+        the lbc.source directory, so the section they are listed under in the
+        config does not change where they are read from. In just-in-time mode,
+        only the files that already exist with a consistent NetCDF header are
+        returned, and the rest are left for boundary_stager, which holds the
+        launch until those needed at startup are linked.
+        '''
+
+        files = []
+        for hour in self.lbc_times():
+            src = self.lbc_source(hour)
+            if self.config.lbc.just_in_time and (
+                    not os.path.exists(src) or preflight.check_file(src)):
+                continue
+            files.append([src, f'INPUT/gfs_bndy.tile7.{hour:03d}.nc'])
+
+        return files
+
+    def boundary_stager(self):
+
+        '''
+        Returns a BoundaryStager for the boundary files that were missing at
+        launch, or None if just-in-time staging is off or nothing is missing.
+        The latest history file written is used as the model's progress.
+        '''
+
+        lbc = self.config.lbc
+        if not lbc.just_in_time:
+            return None
+
+        pending = []
+        for hour in self.lbc_times():
+            dst = os.path.join(self.workdir, f'INPUT/gfs_bndy.tile7.{hour:03d}.nc')
+            if not os.path.lexists(dst):
+                pending.append((hour, self.lbc_source(hour), dst))
+
+        if not pending:
+            return None
+
+        patterns = self.history_patterns()
+
+        def progress():
+            hours = []
+            for pattern in patterns:
+                for path in glob.glob(os.path.join(self.workdir, pattern)):
+                    fhr = OutputWatcher.forecast_hour(path)
+                    if fhr:
+                        hours.append(int(fhr))
+            return max(hours) if hours else None
+
+        return BoundaryStager(
+            pending,
+            self.lbc_interval(),
+            progress,
+            get_process=lambda: self.process,
+            lead_hours=lbc.lead_hours,
+            pause=lbc.pause,
+            poll_interval=lbc.poll_interval,
+            stable_polls=lbc.stable_polls,
+            )
+
     def namsfc_files(self):
 
         '''
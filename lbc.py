@@ -0,0 +1,184 @@
+# pylint: disable=invalid-name
+
+import os
+import signal
+import threading
+import time
+
+import errors
+import preflight
+import utils
+
+
+class BoundaryStager():
+
+    '''
+    Links lateral boundary files into the run directory as upstream
+    preprocessing produces them, while the model is already running.
+
+    pending is a list of (hour, src, dst) tuples for boundary files that did
+    not exist at launch. Since preprocessing may still be writing a file, it is
+    only linked once its size has not changed for stable_polls consecutive
+    polls and its NetCDF header passes preflight.check_file.
+
+    The model reads the boundary file for hour h when it reaches h - interval,
+    so the files for hours 0 and interval are needed at startup, and
+    wait_for_launch holds the launch until they are linked. Later on, once
+    progress() reports a forecast hour within lead_hours of that point (hour 0
+    until the model has written any output) and the file is still not linked,
+    a warning is printed. With pause=True the launcher is also sent SIGTSTP,
+    and SIGCONT once the file has been linked.
+    '''
+
+    def __init__(self, pending, interval, progress, **kwargs):
+
+        self.pending = sorted(pending)
+        self.interval = interval
+        self.progress = progress
+
+        self.get_process = kwargs.get('get_process', lambda: None)
+        self.lead_hours = kwargs.get('lead_hours', 1)
+        self.pause = kwargs.get('pause', False)
+        self.poll_interval = kwargs.get('poll_interval', 30)
+        self.stable_polls = kwargs.get('stable_polls', 2)
+
+        self.paused = False
+        self._sizes = {}
+        self._warned = set()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+
+        ''' Start polling for boundary files in a background thread. '''
+
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+
+        ''' Stop polling and return the list of files that were never linked. '''
+
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+        self.resume()
+
+        for _, src, _ in self.pending:
+            print(f'Boundary file was never staged: {src}')
+
+        return [src for _, src, _ in self.pending]
+
+    def wait_for_launch(self, timeout):
+
+        '''
+        Wait for the files the model reads at startup to be linked, polling
+        every poll_interval seconds. Raises FileNotFound if any are still
+        missing or incomplete after timeout seconds.
+        '''
+
+        deadline = time.time() + timeout
+        while True:
+            self.link_complete()
+            needed = [src for hour, src, _ in self.pending if hour <= self.interval]
+            if not needed:
+                return
+
+            if time.time() >= deadline:
+                msg = ('wait_for_launch: boundary files needed at startup are '
+                       'still missing or incomplete:\n  ' + '\n  '.join(needed))
+                raise errors.FileNotFound(msg)
+
+            print(f'Waiting for boundary files needed at startup: {", ".join(needed)}')
+            time.sleep(self.poll_interval)
+
+    def _watch(self):
+
+        while self.pending and not self._stop.wait(self.poll_interval):
+            self.poll()
+
+        self.resume()
+
+    def poll(self):
+
+        ''' Link any newly completed files, then check the next one needed. '''
+
+        self.link_complete()
+
+        if not self.pending:
+            self.resume()
+            return
+
+        hour, src, _ = self.pending[0]
+
+        # Before the first history file, the model is still at hour 0
+        fhr = self.progress()
+        if fhr is None:
+            fhr = 0
+
+        if fhr < hour - self.interval - self.lead_hours:
+            self.resume()
+            return
+
+        if hour not in self._warned:
+            print(f'WARNING: model is at hour {fhr} and boundary file for '
+                  f'hour {hour} is still missing or incomplete: {src}')
+            self._warned.add(hour)
+
+        if self.pause:
+            self.suspend()
+
+    def link_complete(self):
+
+        ''' Link each pending file that has completed. '''
+
+        for item in list(self.pending):
+            _, src, dst = item
+            if self.is_complete(src):
+                print(f'Linking {src} to {dst}')
+                utils.safe_link(src, dst)
+                self.pending.remove(item)
+
+    def is_complete(self, src):
+
+        ''' Returns True once src has settled and its header is consistent. '''
+
+        if not os.path.exists(src):
+            return False
+
+        size = os.path.getsize(src)
+        last_size, count = self._sizes.get(src, (None, 0))
+        count = count + 1 if size == last_size else 0
+        self._sizes[src] = (size, count)
+
+        if count < self.stable_polls:
+            return False
+
+        problems = preflight.check_file(src)
+        if problems:
+            print(f'Not linking {src} yet: {problems[0]}')
+            return False
+
+        return True
+
+    def suspend(self):
+
+        process = self.get_process()
+        if self.paused or process is None or process.poll() is not None:
+            return
+
+        print(f'Pausing model (pid {process.pid}) until boundary files arrive')
+        os.kill(process.pid, signal.SIGTSTP)
+        self.paused = True
+
+    def resume(self):
+
+        process = self.get_process()
+        if not self.paused or process is None:
+            return
+
+        if process.poll() is None:
+            print(f'Resuming model (pid {process.pid})')
+            os.kill(process.pid, signal.SIGCONT)
+        self.paused = False
@@ -0,0 +1,252 @@
+# pylint: disable=invalid-name
+
+from concurrent.futures import ThreadPoolExecutor
+import mmap
+import os
+import struct
+import threading
+
+try:
+    import netCDF4
+except ImportError:
+    netCDF4 = None
+
+
+HDF5_SIGNATURE = b'\x89HDF\r\n\x1a\n'
+
+# nc_type -> size in bytes
+NC_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 4, 6: 8, 7: 1, 8: 2, 9: 4, 10: 8, 11: 8}
+
+NC_DIMENSION = 0x0A
+NC_VARIABLE = 0x0B
+NC_ATTRIBUTE = 0x0C
+
+# The netCDF-C library is not thread safe
+_NC_LOCK = threading.Lock()
+
+
+class Header():
+
+    ''' The parts of a NetCDF header needed for the preflight checks. '''
+
+    def __init__(self, fmt, dims=None, expected_size=None):
+
+        self.fmt = fmt
+        self.dims = dims
+        self.expected_size = expected_size
+
+
+class _ClassicReader():
+
+    ''' Sequential big-endian reader over a classic NetCDF header. '''
+
+    def __init__(self, buf, version):
+
+        self.buf = buf
+        self.pos = 4
+        self.version = version
+
+    def int32(self):
+        value, = struct.unpack_from('>i', self.buf, self.pos)
+        self.pos += 4
+        return value
+
+    def int64(self):
+        value, = struct.unpack_from('>q', self.buf, self.pos)
+        self.pos += 8
+        return value
+
+    def count(self):
+        ''' NON_NEG values are 8 bytes in CDF-5, and 4 bytes otherwise. '''
+        return self.int64() if self.version == 5 else self.int32()
+
+    def offset(self):
+        ''' Variable begin offsets are 4 bytes only in CDF-1. '''
+        return self.int32() if self.version == 1 else self.int64()
+
+    def name(self):
+        nchars = self.count()
+        name = bytes(self.buf[self.pos:self.pos + nchars]).decode('utf-8')
+        self.pos += _pad4(nchars)
+        return name
+
+    def skip_atts(self):
+        tag = self.int32()
+        nelems = self.count()
+        if tag not in (0, NC_ATTRIBUTE):
+            raise ValueError(f'bad attribute list tag {tag}')
+        for _ in range(nelems):
+            self.name()
+            nc_type = self.int32()
+            nvalues = self.count()
+            self.pos += _pad4(nvalues * NC_TYPE_SIZES[nc_type])
+
+
+def _pad4(nbytes):
+    return (nbytes + 3) // 4 * 4
+
+
+def read_classic(buf, version):
+
+    ''' Returns the Header of a classic NetCDF file mapped in buf. '''
+
+    rd = _ClassicReader(buf, version)
+    numrecs = rd.count()
+
+    tag = rd.int32()
+    ndims = rd.count()
+    if tag not in (0, NC_DIMENSION):
+        raise ValueError(f'bad dimension list tag {tag}')
+
+    dims = []
+    for _ in range(ndims):
+        dims.append((rd.name(), rd.count()))
+
+    rd.skip_atts()
+
+    tag = rd.int32()
+    nvars = rd.count()
+    if tag not in (0, NC_VARIABLE):
+        raise ValueError(f'bad variable list tag {tag}')
+
+    fixed_end = rd.pos
+    record_vars = []
+    for _ in range(nvars):
+        rd.name()
+        dimids = [rd.count() for _ in range(rd.count())]
+        rd.skip_atts()
+        nc_type = rd.int32()
+        rd.count()  # vsize overflows for large variables; recomputed below
+        begin = rd.offset()
+
+        is_record = bool(dimids) and dims[dimids[0]][1] == 0
+        size = NC_TYPE_SIZES[nc_type]
+        for dimid in dimids[1:] if is_record else dimids:
+            size *= dims[dimid][1]
+
+        if is_record:
+            record_vars.append((begin, size))
+        else:
+            fixed_end = max(fixed_end, begin + _pad4(size))
+
+    expected_size = fixed_end
+    if record_vars and numrecs > 0:
+        if len(record_vars) == 1:
+            recsize = record_vars[0][1]
+        else:
+            recsize = sum(_pad4(size) for _, size in record_vars)
+        expected_size = max(expected_size,
+                            min(begin for begin, _ in record_vars) + numrecs * recsize)
+
+    # Report the unlimited dimension with its current number of records
+    dims = {name: length or numrecs for name, length in dims}
+
+    return Header(f'CDF-{version}', dims, expected_size)
+
+
+def read_hdf5(buf, sig_pos):
+
+    ''' Returns the Header of an HDF5 file with its superblock at sig_pos. '''
+
+    pos = sig_pos + 8
+    version = buf[pos]
+
+    if version in (0, 1):
+        size_of_offsets = buf[pos + 5]
+        pos += 16 + (4 if version == 1 else 0)
+        # base address, free-space address, end of file address
+        addr_pos = [pos + i * size_of_offsets for i in (0, 2)]
+    else:
+        size_of_offsets = buf[pos + 1]
+        pos += 4
+        # base address, superblock extension address, end of file address
+        addr_pos = [pos + i * size_of_offsets for i in (0, 2)]
+
+    fmt = {2: '<H', 4: '<I', 8: '<Q'}[size_of_offsets]
+    base, eof = (struct.unpack_from(fmt, buf, p)[0] for p in addr_pos)
+
+    return Header(f'HDF5 (superblock v{version})', expected_size=base + eof)
+
+
+def read_header(path):
+
+    '''
+    Returns the Header of the NetCDF file at path, reading only the header
+    through a memory map. Classic files are parsed for their dimensions and
+    the size implied by their variable layout. For netCDF-4 (HDF5) files, only
+    the expected size is known: the end-of-file address in the superblock.
+    '''
+
+    with open(path, 'rb') as fn:
+        with mmap.mmap(fn.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+
+            if buf[:3] == b'CDF' and buf[3] in (1, 2, 5):
+                return read_classic(buf, buf[3])
+
+            # The HDF5 superblock may follow a user block of 512 * 2**n bytes
+            sig_pos = 0
+            while sig_pos + 8 <= len(buf):
+                if buf[sig_pos:sig_pos + 8] == HDF5_SIGNATURE:
+                    header = read_hdf5(buf, sig_pos)
+                    break
+                sig_pos = 512 if sig_pos == 0 else sig_pos * 2
+            else:
+                raise ValueError('not a NetCDF file')
+
+    return header
+
+
+def check_file(path, expected_dims=None):
+
+    '''
+    Returns a list of problems found in the header of the NetCDF file at path:
+    a file shorter than its header describes, or dimensions that differ from
+    those in expected_dims. Dimensions of netCDF-4 files are read with the
+    netCDF4 module; without it, any expected_dims are reported as not checked.
+    '''
+
+    try:
+        header = read_header(path)
+    except (OSError, ValueError, KeyError, IndexError, struct.error) as err:
+        return [f'{path}: cannot read NetCDF header ({err})']
+
+    size = os.path.getsize(path)
+    if header.expected_size is not None and size < header.expected_size:
+        return [f'{path}: truncated {header.fmt} file, {size} bytes '
+                f'of {header.expected_size} expected']
+
+    if expected_dims and header.dims is None and netCDF4 is not None:
+        # Opening the file only reads its metadata, not variable data.
+        try:
+            with _NC_LOCK, netCDF4.Dataset(path, 'r') as nc:
+                header.dims = {name: len(dim) for name, dim in nc.dimensions.items()}
+        except OSError as err:
+            return [f'{path}: cannot read NetCDF header ({err})']
+
+    if expected_dims and header.dims is None:
+        return [f'{path}: dimensions not checked; reading them from '
+                f'{header.fmt} files needs the netCDF4 module']
+
+    problems = []
+    if expected_dims:
+        for name, length in expected_dims.items():
+            if name not in header.dims:
+                problems.append(f'{path}: dimension {name} is missing')
+            elif header.dims[name] != length:
+                problems.append(f'{path}: dimension {name} is '
+                                f'{header.dims[name]}, expected {length}')
+
+    return problems
+
+
+def check_files(files, workers=8):
+
+    '''
+    Checks each path in the files dict, which maps a path to the dict of
+    expected dimensions for it, in parallel. Returns the list of problems.
+    '''
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = pool.map(lambda item: check_file(*item), files.items())
+
+    return [problem for problems in results for problem in problems]
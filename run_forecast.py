@@ -78,15 +78,18 @@ def parse_args():
 
     return parser.parse_args()
 
-def main(cla):
+def configure(user_config, script_config=None, quiet=False, **kwargs):
 
-    # Load the user-defined settings, and script settings
-    # ----------------------------------------------------
-    user_config = cla.user_config
+    '''
+    Merges the user config into the script config, and loads the grid,
+    machine, and namelist sections it selects, each updated with the
+    corresponding section of the script config. Any of grid_config,
+    machine_config, or nml_config provided in kwargs (as returned by
+    checks.load_config_section) are used instead of the default files.
+
+    Returns the script config dict and the grid, machine, and namelist dicts.
+    '''
 
-    print(f"user config: {user_config}")
-    script_config = cla.script_config
-    print(f"script config: {script_config}")
     if not script_config:
         ushdir = os.path.join(user_config['paths']['homerrfs'], 'configs')
         script_config = checks.load_config_file(
@@ -95,7 +98,7 @@ def main(cla):
 
     # Update script config with user-supplied config file
     # ----------------------------------------------------
-    utils.update_dict(script_config, user_config, quiet=cla.quiet)
+    utils.update_dict(script_config, user_config, quiet=quiet)
 
     # Create Namespace of config for easier syntax
     # ---------------------------------------------
@@ -112,14 +115,14 @@ def main(cla):
     # checks.load_config_section(arg) takes a two-element list as it's input.
     #    arg = [file_name, section_name(s)]
     #
-    grid = cla.grid_config
+    grid = kwargs.get('grid_config')
     if not grid:
         grid = checks.load_config_section([
             config.paths.grid.format(n=config),
             [config.grid_name, config.grid_gen_method],
             ])
 
-    machine = cla.machine_config
+    machine = kwargs.get('machine_config')
     if not machine:
         machine_path = config.paths.machine.format(n=config)
         machine = checks.load_config_section([
@@ -127,7 +130,7 @@ def main(cla):
             config.machine,
             ])
 
-    namelist = cla.nml_config
+    namelist = kwargs.get('nml_config')
     if not namelist:
         namelist = checks.load_config_section([
             config.paths.namelist.format(n=config),
@@ -137,14 +140,34 @@ def main(cla):
     # Update each of the provided configure files with user-supplied settings
     # ------------------------------------------------------------------------
     for cfg in ['grid', 'machine', 'namelist']:
-        utils.update_dict(locals()[cfg][0], script_config.get(cfg), quiet=cla.quiet)
+        utils.update_dict(locals()[cfg][0], script_config.get(cfg), quiet=quiet)
+
+    return script_config, grid[0], machine[0], namelist[0]
+
+def main(cla):
+
+    # Load the user-defined settings, and script settings
+    # ----------------------------------------------------
+    user_config = cla.user_config
 
+    print(f"user config: {user_config}")
+    script_config = cla.script_config
+    print(f"script config: {script_config}")
+
+    script_config, grid, machine, namelist = configure(
+        user_config,
+        script_config,
+        quiet=cla.quiet,
+        grid_config=cla.grid_config,
+        machine_config=cla.machine_config,
+        nml_config=cla.nml_config,
+        )
 
     # Set up a kwargs dict for Forecast object
     # -----------------------------------------
     fcst_kwargs = {
-        'grid': grid[0],
-        'nml': namelist[0],
+        'grid': grid,
+        'nml': namelist,
         'overwrite': cla.overwrite,
         }
 
@@ -152,7 +175,7 @@ def main(cla):
     # ---------------------------
     fcst = Forecast(
         config=script_config,
-        machine=machine[0],
+        machine=machine,
         starttime=cla.start_date,
         **fcst_kwargs,
         )
@@ -0,0 +1,181 @@
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import copy
+import itertools
+import os
+
+import yaml
+
+import checks
+from forecast import Forecast
+from run_forecast import configure
+import utils
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Set up the run directories for a parameter sweep of \
+        Forecasts.'
+    )
+
+    # Required
+    parser.add_argument('-c', '--user_config',
+                        help='Full path to a YAML user config file shared by \
+                        all members of the sweep.',
+                        required=True,
+                        type=checks.load_config_file,
+                        )
+
+    parser.add_argument('-d', '--start_date',
+                        help='The forecast start time in YYYYMMDDHH[mm[ss]] \
+                        format',
+                        required=True,
+                        type=checks.to_datetime,
+                        )
+
+    parser.add_argument('--sweep',
+                        help='Full path to a YAML sweep config file. See \
+                        sweep_variants for its format.',
+                        required=True,
+                        type=checks.load_config_file,
+                        )
+
+    # Optional - configure files
+    parser.add_argument('-s', '--script_config',
+                        help='Full path to a YAML script config file',
+                        type=checks.load_config_file,
+                        )
+
+    parser.add_argument('--overwrite',
+                        action='store_true',
+                        help='If included, overwrites existing member \
+                        directories. Otherwise, exits on existence of one.',
+                        )
+
+    parser.add_argument('--workers',
+                        default=8,
+                        help='Number of members to set up concurrently.',
+                        type=int,
+                        )
+
+    # Optional - switches
+    parser.add_argument('--quiet',
+                        action='store_true',
+                        help='Suppress all output.',
+                        )
+
+    return parser.parse_args()
+
+def sweep_variants(sweep):
+
+    '''
+    Returns a list of (name, parameters) for each member of a sweep. Keys of
+    parameters are dot-separated paths into the user config, e.g.
+    namelist.gfs_physics_nml.imfdeepcnv or grid.layout_x.
+
+    The sweep config supports two modes:
+
+        mode: product   The Cartesian product of the value lists given for
+                        each key in parameters.
+        mode: list      Each item of variants is the parameters of one member.
+
+    Members are named by the name template (default: v{index:03d}).
+    '''
+
+    mode = sweep.get('mode', 'product')
+
+    if mode == 'product':
+        keys = list(sweep['parameters'].keys())
+        variants = [dict(zip(keys, values)) for values in
+                    itertools.product(*sweep['parameters'].values())]
+    elif mode == 'list':
+        variants = sweep['variants']
+    else:
+        msg = f'sweep_variants: mode = {mode} is not product or list.'
+        raise ValueError(msg)
+
+    name = sweep.get('name', 'v{index:03d}')
+    return [(name.format(index=i), params) for i, params in enumerate(variants)]
+
+def dotted_dict(params):
+
+    ''' Returns a nested dict from a dict with dot-separated keys. '''
+
+    ret = {}
+    for key, value in params.items():
+        leaf = ret
+        *sections, last = key.split('.')
+        for sect in sections:
+            leaf = leaf.setdefault(sect, {})
+        leaf[last] = value
+    return ret
+
+def setup_member(cla, script_config, workdir, name, params):
+
+    ''' Creates the run directory for a single member of the sweep. '''
+
+    user_config = copy.deepcopy(cla.user_config)
+    utils.update_dict(user_config, dotted_dict(params), quiet=cla.quiet)
+
+    # Each member runs in a subdirectory of the usual workdir.
+    user_config.setdefault('paths', {})['workdir'] = os.path.join(workdir, name)
+
+    member_config, grid, machine, namelist = configure(
+        user_config,
+        copy.deepcopy(script_config),
+        quiet=cla.quiet,
+        )
+
+    fcst = Forecast(
+        config=member_config,
+        machine=machine,
+        starttime=cla.start_date,
+        grid=grid,
+        nml=namelist,
+        overwrite=cla.overwrite,
+        )
+    fcst.run(dry_run=True)
+
+    return fcst.workdir
+
+def main(cla):
+
+    script_config = cla.script_config
+    if not script_config:
+        ushdir = os.path.join(cla.user_config['paths']['homerrfs'], 'configs')
+        script_config = checks.load_config_file(
+            os.path.join(ushdir, 'fv3_script.yml')
+            )
+
+    # Load the shared config once up front so that each YAML file is parsed
+    # only once. Members only differ by the settings in the sweep.
+    base_config = configure(
+        copy.deepcopy(cla.user_config),
+        copy.deepcopy(script_config),
+        quiet=cla.quiet,
+        )[0]
+    workdir = base_config['paths']['workdir']
+
+    variants = sweep_variants(cla.sweep)
+
+    with ThreadPoolExecutor(max_workers=cla.workers) as pool:
+        futures = [pool.submit(setup_member, cla, script_config, workdir, name, params)
+                   for name, params in variants]
+        workdirs = [future.result() for future in futures]
+
+    index = {
+        name: {'workdir': member_dir, 'parameters': params}
+        for (name, params), member_dir in zip(variants, workdirs)
+        }
+
+    sweep_dir = os.path.dirname(workdirs[0]) if workdirs else None
+    if sweep_dir:
+        index_file = os.path.join(sweep_dir, 'sweep_index.yml')
+        with open(index_file, 'w') as fn:
+            yaml.dump(index, fn)
+        print(f'Set up {len(index)} members. Index written to {index_file}')
+
+if __name__ == '__main__':
+    CLARGS = parse_args()
+    main(CLARGS)
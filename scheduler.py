@@ -0,0 +1,162 @@
+# pylint: disable=invalid-name
+
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import shlex
+import subprocess
+
+import yaml
+
+import errors
+
+
+class Scheduler():
+
+    '''
+    Base class for the schedulers that accept array jobs. The sched entry of
+    a machine in machines.yml selects one of SCHEDULERS.
+    '''
+
+    # Environment variable holding the array index of a task
+    task_id_var = None
+
+    # Prefix for directives in the header of a batch script
+    directive = None
+
+    def __init__(self, options=None):
+        self.options = options or []
+
+    @staticmethod
+    def array_spec(ntasks, throttle=0):
+
+        ''' Returns the task range of an array, with an optional %N throttle. '''
+
+        spec = f'0-{ntasks - 1}'
+        return f'{spec}%{throttle}' if throttle else spec
+
+    def directives(self, ntasks, throttle=0):
+
+        ''' Returns the header lines for the array and the scheduler options. '''
+
+        options = [f'--array={self.array_spec(ntasks, throttle)}'] + self.options
+        return [f'{self.directive} {opt}' for opt in options]
+
+    def submit(self, script, ntasks, throttle=0):
+
+        '''
+        Submit ntasks of script as one array, running at most throttle tasks
+        at once (0 for no limit). Returns a job id.
+        '''
+
+        raise NotImplementedError
+
+    def submit_summary(self, job_id, cmd):
+
+        ''' Run cmd once every task of job_id has finished. '''
+
+        raise NotImplementedError
+
+
+class Slurm(Scheduler):
+
+    task_id_var = 'SLURM_ARRAY_TASK_ID'
+    directive = '#SBATCH'
+
+    def submit(self, script, ntasks, throttle=0):
+
+        cmd = ['sbatch', '--parsable', f'--array={self.array_spec(ntasks, throttle)}', script]
+        print(f'Submitting: {" ".join(cmd)}')
+        pc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True)
+
+        # --parsable prints jobid[;cluster]
+        return pc.stdout.strip().split(';')[0]
+
+    def submit_summary(self, job_id, cmd):
+
+        cmd = ['sbatch', '--parsable', f'--dependency=afterany:{job_id}',
+               *self.options, f'--wrap={cmd}']
+        print(f'Submitting: {" ".join(cmd)}')
+        pc = subprocess.run(cmd, check=True, stdout=subprocess.PIPE,
+                            universal_newlines=True)
+        return pc.stdout.strip().split(';')[0]
+
+
+class LocalScheduler(Scheduler):
+
+    '''
+    A stand-in for a real scheduler that runs the tasks of an array on the
+    current machine, at most throttle at a time, before returning. Useful for
+    testing array jobs where no scheduler is available.
+    '''
+
+    task_id_var = 'LOCAL_ARRAY_TASK_ID'
+    directive = '#LOCAL'
+
+    def submit(self, script, ntasks, throttle=0):
+
+        def run_task(task_id):
+            env = dict(os.environ, **{self.task_id_var: str(task_id)})
+            return subprocess.run(['bash', script], env=env, check=False).returncode
+
+        with ThreadPoolExecutor(max_workers=throttle or ntasks) as pool:
+            list(pool.map(run_task, range(ntasks)))
+
+        return 'local'
+
+    def submit_summary(self, job_id, cmd):
+
+        # All tasks have finished by the time submit returns.
+        subprocess.run(shlex.split(cmd), check=True)
+        return job_id
+
+
+SCHEDULERS = {
+    'local': LocalScheduler,
+    'slurm': Slurm,
+    }
+
+
+def get_scheduler(sched, options=None):
+
+    ''' Returns the Scheduler for the name given by a sched entry. '''
+
+    if sched not in SCHEDULERS:
+        msg = f'get_scheduler: sched = {sched} is not one of {list(SCHEDULERS)}.'
+        raise errors.InvalidConfigSetting(msg)
+
+    return SCHEDULERS[sched](options)
+
+
+def collect_results(array_dir):
+
+    '''
+    Combine the result files written by each task of an array job into
+    summary.yml in array_dir. Returns the summary dict.
+    '''
+
+    tasks = []
+    for result in sorted(glob.glob(os.path.join(array_dir, 'results', 'task_*.yml'))):
+        with open(result, 'r') as fn:
+            tasks.append(yaml.safe_load(fn))
+
+    with open(os.path.join(array_dir, 'array_index.txt'), 'r') as fn:
+        ntasks = len(fn.read().splitlines())
+
+    failed = [task for task in tasks if task['rc'] != 0]
+    summary = {
+        'tasks': ntasks,
+        'succeeded': len(tasks) - len(failed),
+        'failed': len(failed),
+        'missing': ntasks - len(tasks),
+        'results': tasks,
+        }
+
+    with open(os.path.join(array_dir, 'summary.yml'), 'w') as fn:
+        yaml.dump(summary, fn)
+
+    print(f"{summary['succeeded']} of {ntasks} tasks succeeded, "
+          f"{summary['failed']} failed, {summary['missing']} did not report.")
+
+    return summary
@@ -0,0 +1,164 @@
+from argparse import Namespace
+import argparse
+import os
+import shutil
+import sys
+
+import yaml
+
+import checks
+from forecast import BatchJob
+from run_forecast import configure
+import scheduler
+
+
+def parse_args():
+
+    parser = argparse.ArgumentParser(
+        description='Submit a series of cycles, or a set of prepared member \
+        run directories, as a single scheduler array job.'
+    )
+
+    parser.add_argument('-c', '--user_config',
+                        help='Full path to a YAML user config file.',
+                        type=checks.file_exists,
+                        )
+
+    items = parser.add_mutually_exclusive_group(required=True)
+    items.add_argument('-d', '--start_dates',
+                       help='Forecast start times in YYYYMMDDHH[mm[ss]] \
+                       format. One task runs run_forecast.py for each.',
+                       nargs='+',
+                       type=checks.to_datetime,
+                       )
+
+    items.add_argument('--members',
+                       help='Full path to an index of prepared run \
+                       directories, such as the sweep_index.yml written by \
+                       run_sweep.py. One task runs the forecast in each.',
+                       type=checks.load_config_file,
+                       )
+
+    items.add_argument('--summarize',
+                       help='Collect the results of the array job set up in \
+                       this directory into summary.yml.',
+                       type=checks.file_exists,
+                       )
+
+    parser.add_argument('--name',
+                        default='array',
+                        help='Name of the directory in exptdir that holds the \
+                        batch script, index, and results. Results of an \
+                        earlier array job with the same name are removed.',
+                        )
+
+    parser.add_argument('--sched',
+                        help='Override the sched entry of the machine, e.g. \
+                        local to run the tasks here without a scheduler.',
+                        )
+
+    parser.add_argument('--throttle',
+                        help='Maximum number of tasks to run at once. \
+                        Defaults to array_job.throttle in the script config.',
+                        type=int,
+                        )
+
+    parser.add_argument('--overwrite',
+                        action='store_true',
+                        help='Passed on to run_forecast.py for each cycle.',
+                        )
+
+    parser.add_argument('--quiet',
+                        action='store_true',
+                        help='Suppress all output.',
+                        )
+
+    cla = parser.parse_args()
+    if not cla.summarize and not cla.user_config:
+        parser.error('-c/--user_config is required to submit an array job.')
+
+    return cla
+
+def task_command(cla, script_config, machine):
+
+    '''
+    Returns the shell command run by each task, which finds its cycle date or
+    member workdir in $item.
+    '''
+
+    if cla.start_dates:
+        run_forecast = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                    'run_forecast.py')
+        cmd = (f'{sys.executable} {run_forecast} '
+               f'-c {os.path.abspath(cla.user_config)} -d "$item"')
+        return f'{cmd} --overwrite' if cla.overwrite else cmd
+
+    # Members have already been set up, so the executable is launched in each
+    # workdir with the task count that was written to its model_configure.
+    exe = script_config['static']['copy']['fv3_exec'][0][-1]
+    run_cmd = machine['run_command'].format(n=Namespace(nproc='$nproc'))
+    return (f'cd "$item" && '
+            f"nproc=$(awk '/PE_MEMBER01/ {{print $2}}' model_configure) && "
+            f'{run_cmd} ./{exe}')
+
+def main(cla):
+
+    if cla.summarize:
+        scheduler.collect_results(cla.summarize)
+        return
+
+    script_config, _, machine, _ = configure(
+        checks.load_config_file(cla.user_config),
+        quiet=cla.quiet,
+        )
+
+    array_config = script_config.get('array_job', {})
+    sched = scheduler.get_scheduler(
+        cla.sched or machine.get('sched'),
+        array_config.get('options'),
+        )
+    throttle = cla.throttle if cla.throttle is not None else array_config.get('throttle', 0)
+
+    if cla.start_dates:
+        items = [date.strftime('%Y%m%d%H%M%S') for date in cla.start_dates]
+    else:
+        items = [member['workdir'] for member in cla.members.values()]
+
+    # Results left by an earlier array job in the same directory would be
+    # counted in this one's summary.
+    array_dir = os.path.join(script_config['paths']['exptdir'], cla.name)
+    results_dir = os.path.join(array_dir, 'results')
+    if os.path.exists(results_dir):
+        shutil.rmtree(results_dir)
+    summary = os.path.join(array_dir, 'summary.yml')
+    if os.path.exists(summary):
+        os.remove(summary)
+    os.makedirs(results_dir)
+
+    index_file = os.path.join(array_dir, 'array_index.txt')
+    with open(index_file, 'w') as fn:
+        fn.write('\n'.join(items) + '\n')
+
+    script = os.path.join(array_dir, 'array_job.sh')
+    template = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            'templates', 'array_job.sh')
+    BatchJob.render_template(script, template, {
+        'command': task_command(cla, script_config, machine),
+        'directives': sched.directives(len(items), throttle),
+        'index_file': index_file,
+        'results_dir': results_dir,
+        'task_id_var': sched.task_id_var,
+        })
+
+    job_id = sched.submit(script, len(items), throttle)
+    print(f'Submitted {len(items)} tasks as array job {job_id}')
+
+    summary_cmd = f'{sys.executable} {os.path.abspath(__file__)} --summarize {array_dir}'
+    sched.submit_summary(job_id, summary_cmd)
+
+    with open(os.path.join(array_dir, 'job.yml'), 'w') as fn:
+        yaml.dump({'job_id': job_id, 'tasks': len(items), 'throttle': throttle}, fn)
+
+if __name__ == '__main__':
+    CLARGS = parse_args()
+    main(CLARGS)
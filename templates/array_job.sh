@@ -0,0 +1,15 @@
+#!/bin/bash
+{% for line in directives %}{{ line }}
+{% endfor %}
+# Each task of the array picks its line of the index: a cycle date, or the
+# workdir of an ensemble or sweep member.
+task_id=${{ '{' }}{{ task_id_var }}{{ '}' }}
+item=$(sed -n "$((task_id + 1))p" {{ index_file }})
+
+{{ command }}
+rc=$?
+
+printf "task: %s\nitem: '%s'\nrc: %s\n" "$task_id" "$item" "$rc" \
+  > {{ results_dir }}/task_$(printf '%05d' "$task_id").yml
+
+exit $rc
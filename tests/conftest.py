@@ -0,0 +1,51 @@
+import datetime as dt
+import os
+import sys
+
+import pytest
+
+# The scripts are run from the repository root, so import them from there.
+HOMERRFS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, HOMERRFS)
+
+# pylint: disable=wrong-import-position
+from forecast import Forecast
+from run_forecast import configure
+import utils
+
+
+@pytest.fixture
+def make_forecast(tmp_path):
+
+    '''
+    Returns a function that creates a Forecast in tmp_path for 2020010100,
+    from the repository configs updated with any user settings given. Its
+    workdir is created, but nothing is staged or run.
+    '''
+
+    def _make_forecast(**settings):
+
+        user_config = {
+            'grid_name': 'GSD_HRRR25km',
+            'phys_pkg': 'FV3_GSD_SAR',
+            'machine': 'hera',
+            'nhours_fcst': 12,
+            'paths': {
+                'homerrfs': HOMERRFS,
+                'ushdir': HOMERRFS,
+                'exptdir': str(tmp_path / 'expt'),
+                'input': str(tmp_path / 'input'),
+                },
+            }
+        utils.update_dict(user_config, settings, quiet=True)
+
+        script_config, grid, machine, namelist = configure(user_config, quiet=True)
+        return Forecast(
+            config=script_config,
+            machine=machine,
+            starttime=dt.datetime(2020, 1, 1, 0),
+            grid=grid,
+            nml=namelist,
+            )
+
+    return _make_forecast
@@ -0,0 +1,175 @@
+'''
+Tests for the Forecast methods that recover a failed run and stage boundary
+files.
+'''
+
+import datetime as dt
+import os
+
+import pytest
+
+from watcher import OutputWatcher
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+
+def write_nc(path, truncate=False):
+
+    with netCDF4.Dataset(path, 'w', format='NETCDF3_64BIT_OFFSET') as nc:
+        nc.createDimension('xaxis_1', 20)
+        nc.createVariable('v', 'f4', ('xaxis_1',))[:] = 1
+
+    if truncate:
+        with open(path, 'rb') as fn:
+            data = fn.read()
+        with open(path, 'wb') as fn:
+            fn.write(data[:-40])
+
+
+def write_restart_set(fcst, hour, truncate=None):
+
+    ''' Writes the restart files the model writes at hour, truncating one. '''
+
+    prefix = f'20200101.{hour:02d}0000'
+    for fname in fcst.config.recovery.restart_files:
+        path = os.path.join(fcst.workdir, 'RESTART', f'{prefix}.{fname}')
+        if fname == 'coupler.res':
+            with open(path, 'w') as fn:
+                fn.write('     2        (Calendar: no_calendar=0, thirty_day_months=1, julian=2, gregorian=3, noleap=4)\n'
+                         '  2020     1     1     0     0     0        Model start time:   year, month, day, hour, minute, second\n'
+                         f'  2020     1     1    {hour:2d}     0     0        Current model time: year, month, day, hour, minute, second\n')
+        else:
+            write_nc(path, truncate=fname == truncate)
+
+
+@pytest.fixture
+def fcst(make_forecast):
+
+    fcst = make_forecast()
+    for subdir in ('INPUT', 'RESTART'):
+        os.makedirs(os.path.join(fcst.workdir, subdir))
+    return fcst
+
+
+def test_restart_sets(fcst):
+
+    write_restart_set(fcst, 3)
+    write_restart_set(fcst, 6)
+
+    # A set missing one of its files is not a candidate
+    os.remove(os.path.join(fcst.workdir, 'RESTART', '20200101.060000.sfc_data.nc'))
+
+    sets = fcst.restart_sets()
+    assert list(sets) == [dt.datetime(2020, 1, 1, 3)]
+    assert len(sets[dt.datetime(2020, 1, 1, 3)]) == len(fcst.config.recovery.restart_files)
+
+
+def test_restart_set_problems(fcst):
+
+    write_restart_set(fcst, 3)
+    write_restart_set(fcst, 6, truncate='phy_data.nc')
+    with open(os.path.join(fcst.workdir, 'RESTART', '20200101.030000.coupler.res'), 'w') as fn:
+        fn.write('garbage\n')
+
+    sets = fcst.restart_sets()
+    problems = fcst.restart_set_problems(sets[dt.datetime(2020, 1, 1, 6)])
+    assert len(problems) == 1
+    assert 'phy_data.nc: truncated' in problems[0]
+
+    problems = fcst.restart_set_problems(sets[dt.datetime(2020, 1, 1, 3)])
+    assert len(problems) == 1
+    assert 'coupler.res: cannot read model start time' in problems[0]
+
+
+def test_warm_restart(fcst):
+
+    # The newest set is truncated, so the model continues from hour 3.
+    write_restart_set(fcst, 3)
+    write_restart_set(fcst, 6, truncate='fv_core.res.tile1.nc')
+
+    assert fcst.warm_restart()
+
+    core = os.path.join(fcst.workdir, 'INPUT', 'fv_core.res.tile1.nc')
+    assert os.readlink(core).endswith('RESTART/20200101.030000.fv_core.res.tile1.nc')
+    assert fcst.starttime == dt.datetime(2020, 1, 1, 0)
+
+    with open(os.path.join(fcst.workdir, 'input.nml')) as fn:
+        nml = fn.read().lower()
+    assert 'warm_start = .true.' in nml
+    assert 'external_ic = .false.' in nml
+
+
+def test_warm_restart_none(fcst):
+
+    write_restart_set(fcst, 6, truncate='sfc_data.nc')
+    assert not fcst.warm_restart()
+
+
+def test_warm_restart_discards_history(fcst, tmp_path):
+
+    # The failed attempt finished hour 3, and left a partial hour 4 that the
+    # watcher already post-processed.
+    record = str(tmp_path / 'record.txt')
+    history = {fhr: os.path.join(fcst.workdir, f'dynf{fhr:03d}.nc') for fhr in (3, 4)}
+    for path in history.values():
+        with open(path, 'w') as fn:
+            fn.write('x' * 300)
+    with open(record, 'w') as fn:
+        fn.write(''.join(f'{path}\n' for path in history.values()))
+
+    fcst.watcher = OutputWatcher(fcst.workdir, fcst.history_patterns(), 'true', record)
+    write_restart_set(fcst, 3)
+
+    assert fcst.warm_restart()
+
+    assert os.path.exists(history[3])
+    assert not os.path.exists(history[4])
+    assert fcst.watcher.dispatched == {history[3]}
+    assert fcst.watcher.load_record() == {history[3]}
+
+
+@pytest.mark.parametrize('nhours_fcst, times', [
+    (12, [0, 6, 12]),
+    (13, [0, 6, 12, 18]),
+    ])
+def test_lbc_times(make_forecast, nhours_fcst, times):
+
+    fcst = make_forecast(nhours_fcst=nhours_fcst)
+    assert fcst.lbc_interval() == 6
+    assert fcst.lbc_times() == times
+
+
+def test_lbc_files(make_forecast, tmp_path):
+
+    lbc_dir = tmp_path / 'lbc'
+    lbc_dir.mkdir()
+    fcst = make_forecast(paths={'lbc': str(lbc_dir)}, lbc={'source': 'lbc'})
+
+    # Every boundary file is read from lbc.source
+    assert fcst.lbc_files() == [
+        [str(lbc_dir / f'gfs_bndy.tile7.{hour:03d}.nc'), f'INPUT/gfs_bndy.tile7.{hour:03d}.nc']
+        for hour in (0, 6, 12)
+        ]
+
+
+def test_lbc_files_just_in_time(make_forecast, tmp_path):
+
+    lbc_dir = tmp_path / 'lbc'
+    lbc_dir.mkdir()
+    write_nc(str(lbc_dir / 'gfs_bndy.tile7.000.nc'))
+    write_nc(str(lbc_dir / 'gfs_bndy.tile7.006.nc'), truncate=True)
+
+    fcst = make_forecast(paths={'lbc': str(lbc_dir)},
+                         lbc={'source': 'lbc', 'just_in_time': True})
+
+    # Only complete files are staged; the rest are left for the stager
+    assert fcst.lbc_files() == [
+        [str(lbc_dir / 'gfs_bndy.tile7.000.nc'), 'INPUT/gfs_bndy.tile7.000.nc'],
+        ]
+
+    os.makedirs(os.path.join(fcst.workdir, 'INPUT'))
+    os.symlink(str(lbc_dir / 'gfs_bndy.tile7.000.nc'),
+               os.path.join(fcst.workdir, 'INPUT', 'gfs_bndy.tile7.000.nc'))
+
+    stager = fcst.boundary_stager()
+    assert [hour for hour, _, _ in stager.pending] == [6, 12]
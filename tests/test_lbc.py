@@ -0,0 +1,131 @@
+'''
+Tests for staging boundary files while the model runs.
+'''
+
+import os
+import signal
+
+import pytest
+
+import errors
+import lbc
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+
+class FakeProcess():
+
+    ''' Stands in for the Popen of the launcher. '''
+
+    pid = 12345
+
+    def __init__(self):
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+@pytest.fixture
+def signals(monkeypatch):
+
+    ''' Records the signals sent by the stager instead of sending them. '''
+
+    sent = []
+    monkeypatch.setattr(lbc.os, 'kill', lambda pid, sig: sent.append((pid, sig)))
+    return sent
+
+
+def write_nc(path):
+
+    with netCDF4.Dataset(path, 'w', format='NETCDF3_64BIT_OFFSET') as nc:
+        nc.createDimension('x', 20)
+        nc.createVariable('v', 'f4', ('x',))[:] = 1
+
+
+def make_stager(tmp_path, hours, progress, **kwargs):
+
+    src_dir = tmp_path / 'lbc'
+    dst_dir = tmp_path / 'INPUT'
+    src_dir.mkdir(exist_ok=True)
+    dst_dir.mkdir(exist_ok=True)
+
+    pending = [(hour, str(src_dir / f'gfs_bndy.tile7.{hour:03d}.nc'),
+                str(dst_dir / f'gfs_bndy.tile7.{hour:03d}.nc')) for hour in hours]
+    kwargs.setdefault('stable_polls', 1)
+    kwargs.setdefault('poll_interval', 0)
+    return lbc.BoundaryStager(pending, 6, progress, **kwargs)
+
+
+def test_poll_links_completed(tmp_path):
+
+    stager = make_stager(tmp_path, [12, 18], lambda: 3)
+    _, src, dst = stager.pending[0]
+    write_nc(src)
+
+    # The size must be seen unchanged for stable_polls polls first
+    stager.poll()
+    assert not os.path.lexists(dst)
+    stager.poll()
+    assert os.readlink(dst) == src
+    assert [hour for hour, _, _ in stager.pending] == [18]
+
+
+def test_poll_pauses_before_first_output(tmp_path, signals):
+
+    # The model has written no history yet, so it needs hour 6 now.
+    process = FakeProcess()
+    stager = make_stager(tmp_path, [6, 12], lambda: None,
+                         pause=True, get_process=lambda: process)
+
+    stager.poll()
+    assert stager.paused
+    assert signals == [(process.pid, signal.SIGTSTP)]
+
+    write_nc(stager.pending[0][1])
+    stager.poll()
+    stager.poll()
+
+    # Hour 12 is not needed until the model reaches hour 6 - lead_hours
+    assert not stager.paused
+    assert signals[-1] == (process.pid, signal.SIGCONT)
+
+
+def test_poll_waits_for_lead_hours(tmp_path, signals):
+
+    fhr = {'now': 2}
+    process = FakeProcess()
+    stager = make_stager(tmp_path, [12], lambda: fhr['now'], lead_hours=1,
+                         pause=True, get_process=lambda: process)
+
+    stager.poll()
+    assert not stager.paused
+
+    fhr['now'] = 5
+    stager.poll()
+    assert stager.paused
+    assert signals == [(process.pid, signal.SIGTSTP)]
+
+    # A model that has exited is not signalled again
+    process.returncode = 1
+    stager.stop()
+    assert signals == [(process.pid, signal.SIGTSTP)]
+
+
+def test_wait_for_launch(tmp_path):
+
+    stager = make_stager(tmp_path, [0, 6, 12], lambda: None)
+    for _, src, _ in stager.pending[:2]:
+        write_nc(src)
+
+    stager.wait_for_launch(timeout=10)
+    assert [hour for hour, _, _ in stager.pending] == [12]
+
+
+def test_wait_for_launch_timeout(tmp_path):
+
+    stager = make_stager(tmp_path, [0, 6], lambda: None)
+    write_nc(stager.pending[0][1])
+
+    with pytest.raises(errors.FileNotFound, match='gfs_bndy.tile7.006.nc'):
+        stager.wait_for_launch(timeout=0)
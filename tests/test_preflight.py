@@ -0,0 +1,59 @@
+'''
+Tests for the NetCDF header checks in preflight.
+'''
+
+import pytest
+
+import preflight
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+
+def make_file(path, fmt, nx=200, ny=110):
+
+    with netCDF4.Dataset(path, 'w', format=fmt) as nc:
+        nc.createDimension('xaxis_1', nx)
+        nc.createDimension('yaxis_1', ny)
+        nc.createVariable('v', 'f4', ('yaxis_1', 'xaxis_1'))[:] = 1
+    return str(path)
+
+
+@pytest.mark.parametrize('fmt', ['NETCDF3_64BIT_OFFSET', 'NETCDF4'])
+def test_dimensions(tmp_path, fmt):
+
+    path = make_file(tmp_path / 'sfc_data.nc', fmt)
+
+    assert preflight.check_file(path, {'xaxis_1': 200, 'yaxis_1': 110}) == []
+
+    problems = preflight.check_file(path, {'xaxis_1': 201, 'zaxis_1': 64})
+    assert problems == [
+        f'{path}: dimension xaxis_1 is 200, expected 201',
+        f'{path}: dimension zaxis_1 is missing',
+        ]
+
+
+@pytest.mark.parametrize('fmt', ['NETCDF3_64BIT_OFFSET', 'NETCDF4'])
+def test_truncated(tmp_path, fmt):
+
+    path = make_file(tmp_path / 'sfc_data.nc', fmt)
+    with open(path, 'rb') as fn:
+        data = fn.read()
+    with open(path, 'wb') as fn:
+        fn.write(data[:-100])
+
+    problems = preflight.check_file(path, {'xaxis_1': 200})
+    assert len(problems) == 1
+    assert 'truncated' in problems[0]
+
+
+def test_hdf5_without_netcdf4(tmp_path, monkeypatch):
+
+    path = make_file(tmp_path / 'sfc_data.nc', 'NETCDF4')
+    monkeypatch.setattr(preflight, 'netCDF4', None)
+
+    # The size check needs only the header, but the dimensions cannot be
+    # read, so they are reported rather than passed.
+    assert preflight.check_file(path) == []
+    problems = preflight.check_file(path, {'xaxis_1': 200})
+    assert len(problems) == 1
+    assert 'dimensions not checked' in problems[0]
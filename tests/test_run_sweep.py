@@ -0,0 +1,130 @@
+'''
+Tests for setting up the members of a parameter sweep.
+'''
+
+from argparse import Namespace
+import datetime as dt
+import os
+
+import f90nml
+import pytest
+import yaml
+
+from forecast import Forecast
+import run_sweep
+
+HOMERRFS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_product():
+
+    variants = run_sweep.sweep_variants({
+        'parameters': {
+            'grid.layout_x': [1, 2],
+            'namelist.gfs_physics_nml.imfdeepcnv': [2, -1],
+            },
+        })
+
+    assert variants == [
+        ('v000', {'grid.layout_x': 1, 'namelist.gfs_physics_nml.imfdeepcnv': 2}),
+        ('v001', {'grid.layout_x': 1, 'namelist.gfs_physics_nml.imfdeepcnv': -1}),
+        ('v002', {'grid.layout_x': 2, 'namelist.gfs_physics_nml.imfdeepcnv': 2}),
+        ('v003', {'grid.layout_x': 2, 'namelist.gfs_physics_nml.imfdeepcnv': -1}),
+        ]
+
+
+def test_list():
+
+    variants = run_sweep.sweep_variants({
+        'mode': 'list',
+        'name': 'ksplit{index}',
+        'variants': [
+            {'namelist.fv_core_nml.k_split': 2},
+            {'namelist.fv_core_nml.k_split': 4, 'namelist.fv_core_nml.n_split': 5},
+            ],
+        })
+
+    assert variants == [
+        ('ksplit0', {'namelist.fv_core_nml.k_split': 2}),
+        ('ksplit1', {'namelist.fv_core_nml.k_split': 4, 'namelist.fv_core_nml.n_split': 5}),
+        ]
+
+
+def test_invalid_mode():
+
+    with pytest.raises(ValueError, match='mode = zip'):
+        run_sweep.sweep_variants({'mode': 'zip', 'parameters': {}})
+
+
+def test_dotted_dict():
+
+    assert run_sweep.dotted_dict({
+        'nhours_fcst': 6,
+        'grid.layout_x': 2,
+        'namelist.fv_core_nml.k_split': 4,
+        'namelist.fv_core_nml.n_split': 5,
+        'namelist.gfs_physics_nml.imfdeepcnv': -1,
+        }) == {
+            'nhours_fcst': 6,
+            'grid': {'layout_x': 2},
+            'namelist': {
+                'fv_core_nml': {'k_split': 4, 'n_split': 5},
+                'gfs_physics_nml': {'imfdeepcnv': -1},
+                },
+            }
+
+
+def test_members(monkeypatch, tmp_path):
+
+    # There are no input files to stage here; only the generated
+    # configuration files of each member are checked.
+    monkeypatch.setattr(Forecast, 'stage_all', lambda self, section: None)
+
+    cla = Namespace(
+        user_config={
+            'grid_name': 'GSD_HRRR25km',
+            'phys_pkg': 'FV3_GSD_SAR',
+            'machine': 'hera',
+            'nhours_fcst': 6,
+            'paths': {
+                'homerrfs': HOMERRFS,
+                'ushdir': HOMERRFS,
+                'exptdir': str(tmp_path / 'expt'),
+                },
+            },
+        start_date=dt.datetime(2020, 1, 1, 0),
+        sweep={
+            'parameters': {
+                'grid.layout_x': [1, 2],
+                'namelist.gfs_physics_nml.imfdeepcnv': [2, -1],
+                },
+            },
+        script_config=None,
+        overwrite=False,
+        workers=4,
+        quiet=True,
+        )
+    run_sweep.main(cla)
+
+    with open(tmp_path / 'expt' / '2020010100' / 'sweep_index.yml') as fn:
+        index = yaml.safe_load(fn)
+    assert sorted(index) == ['v000', 'v001', 'v002', 'v003']
+
+    pe_member01 = {}
+    for name, member in index.items():
+        params = member['parameters']
+        assert member['workdir'] == str(tmp_path / 'expt' / '2020010100' / name)
+
+        nml = f90nml.read(os.path.join(member['workdir'], 'input.nml'))
+        assert nml['fv_core_nml']['layout'][0] == params['grid.layout_x']
+        assert nml['gfs_physics_nml']['imfdeepcnv'] == params['namelist.gfs_physics_nml.imfdeepcnv']
+
+        with open(os.path.join(member['workdir'], 'model_configure')) as fn:
+            pe_member01[name] = yaml.safe_load(fn)['PE_MEMBER01']
+
+    # Members with the same layout run with the same number of tasks, and the
+    # wider layout with layout_y more.
+    layout_y = nml['fv_core_nml']['layout'][1]
+    assert pe_member01['v000'] == pe_member01['v001']
+    assert pe_member01['v002'] == pe_member01['v003']
+    assert pe_member01['v002'] - pe_member01['v000'] == layout_y
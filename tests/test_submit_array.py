@@ -0,0 +1,173 @@
+'''
+Tests for submitting array jobs, run with the local scheduler so that no
+batch system is needed.
+'''
+
+import os
+import sys
+
+import pytest
+import yaml
+
+import scheduler
+import submit_array
+
+HOMERRFS = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def user_config(tmp_path):
+
+    ''' A user config for a machine whose tasks run locally with sh. '''
+
+    machines = tmp_path / 'machines.yml'
+    machines.write_text(yaml.dump({
+        'local': {
+            'run_command': 'sh',
+            'ncores_per_node': 1,
+            'sched': 'local',
+            'dirs': {},
+            },
+        }))
+
+    config = tmp_path / 'user.yml'
+    config.write_text(yaml.dump({
+        'grid_name': 'GSD_HRRR25km',
+        'phys_pkg': 'FV3_GSD_SAR',
+        'machine': 'local',
+        'paths': {
+            'homerrfs': HOMERRFS,
+            'exptdir': str(tmp_path / 'expt'),
+            'machine': str(machines),
+            },
+        }))
+    return str(config)
+
+
+def submit(monkeypatch, *args):
+
+    ''' Runs submit_array.py with args and returns its array directory. '''
+
+    monkeypatch.setattr(sys, 'argv', ['submit_array.py', *args])
+    cla = submit_array.parse_args()
+    submit_array.main(cla)
+    config = yaml.safe_load(open(cla.user_config))
+    return os.path.join(config['paths']['exptdir'], cla.name)
+
+
+def load_summary(array_dir):
+
+    with open(os.path.join(array_dir, 'summary.yml')) as fn:
+        return yaml.safe_load(fn)
+
+
+def test_array_spec():
+
+    assert scheduler.Scheduler.array_spec(5) == '0-4'
+    assert scheduler.Scheduler.array_spec(5, 2) == '0-4%2'
+
+
+def test_slurm_submit_throttle(monkeypatch):
+
+    calls = []
+
+    class Completed():
+        stdout = '1234;cluster\n'
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return Completed()
+
+    monkeypatch.setattr(scheduler.subprocess, 'run', fake_run)
+    job_id = scheduler.Slurm().submit('array_job.sh', 10, throttle=3)
+
+    assert job_id == '1234'
+    assert '--array=0-9%3' in calls[0]
+
+
+def test_render_script(monkeypatch, user_config):
+
+    array_dir = submit(monkeypatch, '-c', user_config, '--throttle', '2',
+                       '-d', '2020010100', '2020010106', '2020010112')
+
+    with open(os.path.join(array_dir, 'array_job.sh')) as fn:
+        script = fn.read()
+
+    assert '#LOCAL --array=0-2%2' in script
+    assert 'task_id=${LOCAL_ARRAY_TASK_ID}' in script
+    assert 'run_forecast.py' in script
+    assert '-d "$item"' in script
+
+    with open(os.path.join(array_dir, 'array_index.txt')) as fn:
+        assert fn.read().split() == [
+            '20200101000000', '20200101060000', '20200101120000']
+
+
+def test_dates(monkeypatch, tmp_path, user_config):
+
+    # Stand in for run_forecast.py with a command that records its cycle.
+    out_dir = tmp_path / 'out'
+    out_dir.mkdir()
+    monkeypatch.setattr(submit_array, 'task_command',
+                        lambda *args: f'touch {out_dir}/"$item"')
+
+    array_dir = submit(monkeypatch, '-c', user_config, '--throttle', '1',
+                       '-d', '2020010100', '2020010106')
+
+    assert sorted(os.listdir(out_dir)) == ['20200101000000', '20200101060000']
+
+    summary = load_summary(array_dir)
+    assert summary['tasks'] == 2
+    assert summary['succeeded'] == 2
+
+
+def test_members(monkeypatch, tmp_path, user_config):
+
+    # Each member runs ./fv3.exe with the machine's run_command, sh. Member 1
+    # exits non-zero, and member 2 kills its task before it can report.
+    scripts = [
+        'touch ran',
+        'exit 3',
+        'kill -9 $PPID',
+        ]
+    members = {}
+    for index, script in enumerate(scripts):
+        workdir = tmp_path / f'm{index:03d}'
+        workdir.mkdir()
+        (workdir / 'model_configure').write_text('PE_MEMBER01: 4\n')
+        (workdir / 'fv3.exe').write_text(f'{script}\n')
+        members[f'm{index:03d}'] = {'workdir': str(workdir)}
+
+    index_file = tmp_path / 'sweep_index.yml'
+    index_file.write_text(yaml.dump(members))
+
+    array_dir = submit(monkeypatch, '-c', user_config, '--name', 'sweep',
+                       '--members', str(index_file))
+
+    assert (tmp_path / 'm000' / 'ran').exists()
+
+    summary = load_summary(array_dir)
+    assert summary['tasks'] == 3
+    assert summary['succeeded'] == 1
+    assert summary['failed'] == 1
+    assert summary['missing'] == 1
+
+    failed = [task for task in summary['results'] if task['rc'] != 0]
+    assert failed == [{'task': 1, 'item': str(tmp_path / 'm001'), 'rc': 3}]
+
+
+def test_resubmit(monkeypatch, tmp_path, user_config):
+
+    monkeypatch.setattr(submit_array, 'task_command', lambda *args: 'exit 1')
+    submit(monkeypatch, '-c', user_config, '-d', '2020010100', '2020010106')
+
+    # Resubmitting to the same directory does not count the earlier tasks
+    monkeypatch.setattr(submit_array, 'task_command', lambda *args: 'true')
+    array_dir = submit(monkeypatch, '-c', user_config, '-d', '2020010112')
+
+    summary = load_summary(array_dir)
+    assert summary['tasks'] == 1
+    assert summary['succeeded'] == 1
+    assert summary['failed'] == 0
+    assert summary['missing'] == 0
+    assert summary['results'] == [{'task': 0, 'item': '20200101120000', 'rc': 0}]
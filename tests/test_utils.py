@@ -0,0 +1,72 @@
+'''
+Tests for the file copies in utils.
+'''
+
+import os
+
+import pytest
+
+import errors
+import utils
+
+
+@pytest.fixture
+def src(tmp_path):
+
+    path = tmp_path / 'src.nc'
+    path.write_bytes(os.urandom(3 * 1024 + 5))
+    return str(path)
+
+
+def dst_files(tmp_path):
+    return sorted(name for name in os.listdir(tmp_path) if name != 'src.nc')
+
+
+def test_safe_copy(tmp_path, src):
+
+    dst = str(tmp_path / 'dst.nc')
+    assert utils.safe_copy(src, dst, checksum='md5') == os.path.getsize(src)
+
+    with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+        assert fsrc.read() == fdst.read()
+    assert dst_files(tmp_path) == ['dst.nc']
+
+
+@pytest.mark.skipif(not hasattr(os, 'copy_file_range'), reason='no copy_file_range')
+def test_copy_nothing_falls_back(tmp_path, src, monkeypatch):
+
+    # copy_file_range copies nothing, so the copy moves on to sendfile.
+    monkeypatch.setattr(os, 'copy_file_range', lambda *args: 0)
+
+    dst = str(tmp_path / 'dst.nc')
+    utils.safe_copy(src, dst)
+
+    with open(src, 'rb') as fsrc, open(dst, 'rb') as fdst:
+        assert fsrc.read() == fdst.read()
+
+
+@pytest.mark.skipif(not hasattr(os, 'copy_file_range'), reason='no copy_file_range')
+def test_short_copy_raises(tmp_path, src, monkeypatch):
+
+    # copy_file_range stops after its first chunk.
+    copy_file_range = os.copy_file_range
+    calls = []
+
+    def short_copy(infd, outfd, count):
+        calls.append(count)
+        return copy_file_range(infd, outfd, 1024) if len(calls) == 1 else 0
+
+    monkeypatch.setattr(os, 'copy_file_range', short_copy)
+
+    with pytest.raises(errors.IncompleteCopy):
+        utils.safe_copy(src, str(tmp_path / 'dst.nc'), checksum='md5')
+    assert dst_files(tmp_path) == []
+
+
+def test_size_mismatch_raises(tmp_path, src, monkeypatch):
+
+    monkeypatch.setattr(utils, '_kernel_copy', lambda fsrc, fdst: 0)
+
+    with pytest.raises(errors.IncompleteCopy):
+        utils.safe_copy(src, str(tmp_path / 'dst.nc'))
+    assert dst_files(tmp_path) == []
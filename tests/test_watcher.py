@@ -0,0 +1,116 @@
+'''
+Tests for post-processing history files while the forecast runs.
+'''
+
+import os
+
+import pytest
+
+from watcher import OutputWatcher
+
+netCDF4 = pytest.importorskip('netCDF4')
+
+
+def write_nc(path, truncate=False):
+
+    with netCDF4.Dataset(path, 'w', format='NETCDF3_64BIT_OFFSET') as nc:
+        nc.createDimension('x', 20)
+        nc.createVariable('v', 'f4', ('x',))[:] = 1
+
+    if truncate:
+        with open(path, 'rb') as fn:
+            data = fn.read()
+        with open(path, 'wb') as fn:
+            fn.write(data[:-40])
+    return path
+
+
+@pytest.fixture
+def workdir(tmp_path):
+
+    workdir = tmp_path / 'workdir'
+    workdir.mkdir()
+    return workdir
+
+
+def run_watcher(workdir, record, command, final=True, polls=0):
+
+    ''' Runs a watcher for polls polls, and returns what stop returns. '''
+
+    watcher = OutputWatcher(str(workdir), ['dynf*.nc'], command, str(record),
+                            poll_interval=3600, stable_polls=1)
+    watcher.start()
+    for _ in range(polls):
+        watcher.poll()
+    return watcher.stop(final=final)
+
+
+def test_record_and_skip(workdir, tmp_path):
+
+    record = tmp_path / 'record.txt'
+    path = write_nc(str(workdir / 'dynf001.nc'))
+
+    assert run_watcher(workdir, record, 'true {path}') == [(path, 0)]
+    assert record.read_text() == f'{path}\n'
+
+    # A later watcher, e.g. for a rerun of the cycle, skips recorded files
+    assert run_watcher(workdir, record, 'true {path}') == []
+
+
+def test_retry_after_failure(workdir, tmp_path):
+
+    record = tmp_path / 'record.txt'
+    path = write_nc(str(workdir / 'dynf001.nc'))
+
+    assert run_watcher(workdir, record, 'false {path}') == [(path, 1)]
+    assert not record.exists()
+
+    assert run_watcher(workdir, record, 'true {path}') == [(path, 0)]
+    assert record.read_text() == f'{path}\n'
+
+
+def test_command_not_found(workdir, tmp_path):
+
+    record = tmp_path / 'record.txt'
+    path = write_nc(str(workdir / 'dynf001.nc'))
+
+    results = run_watcher(workdir, record, str(tmp_path / 'missing') + ' {path}')
+    assert results == [(path, 127)]
+    assert not record.exists()
+
+
+def test_final_flush(workdir, tmp_path):
+
+    # A file that has not settled is only dispatched by the final poll, once
+    # the model is known to have finished.
+    record = tmp_path / 'record.txt'
+    path = write_nc(str(workdir / 'dynf001.nc'))
+
+    assert run_watcher(workdir, record, 'true {path}', final=False, polls=1) == []
+    assert run_watcher(workdir, record, 'true {path}', final=True, polls=1) == [(path, 0)]
+
+
+def test_complete_when_settled(workdir, tmp_path):
+
+    record = tmp_path / 'record.txt'
+    settled = write_nc(str(workdir / 'dynf001.nc'))
+    truncated = write_nc(str(workdir / 'dynf002.nc'), truncate=True)
+
+    # Both sizes are unchanged on the second poll, but the truncated file's
+    # header describes more data than it holds.
+    assert run_watcher(workdir, record, 'true {path}', final=False, polls=2) == [(settled, 0)]
+    assert truncated not in record.read_text()
+
+
+def test_marker(workdir, tmp_path):
+
+    record = tmp_path / 'record.txt'
+    path = write_nc(str(workdir / 'dynf001.nc'))
+    write_nc(str(workdir / 'dynf002.nc'))
+    (workdir / 'logf001').write_text('completed\n')
+
+    watcher = OutputWatcher(str(workdir), ['dynf*.nc'], 'true {path}', str(record),
+                            marker='logf{fhr}', poll_interval=3600)
+    watcher.start()
+    watcher.poll()
+    assert watcher.stop(final=False) == [(path, 0)]
@@ -1,11 +1,18 @@
 # pylint: disable=invalid-name
 
 from argparse import Namespace
+from concurrent.futures import ThreadPoolExecutor
+import errno
+import hashlib
 import os
 import shutil
+import time
 
 import errors
 
+# Size of each chunk copied by safe_copy
+COPY_CHUNK = 64 * 1024 * 1024
+
 
 def namespace(ns: Namespace, d: dict):
 
@@ -21,18 +28,148 @@ def namespace(ns: Namespace, d: dict):
                 ns.__dict__[k] = v
 
 
-def safe_copy(src, dst):
+def to_dict(ns: Namespace):
+
+    ''' Returns a dict for an arbitrarily deep Namespace object, ns. The inverse of namespace. '''
+
+    return {k: to_dict(v) if isinstance(v, Namespace) else v for k, v in vars(ns).items()}
+
+
+def safe_copy(src, dst, checksum=None):
+
+    '''
+    Copies src to dst, keeping file metadata like shutil.copy2. The data is
+    copied by the kernel (copy_file_range, or sendfile) into a hidden
+    temporary file next to dst, which is only renamed to dst once it is
+    complete, so an interrupted copy never leaves a partial file at dst.
+
+    Input:
+        src       Path to the file to copy.
+        dst       Path to the destination file.
+        checksum  Optional hashlib algorithm name, e.g. md5 or sha256. When
+                  set, the copy is verified against src before the rename.
+
+    Output:
+        The number of bytes copied.
+    '''
 
     # Check that src exists
     if not os.path.exists(src):
         raise errors.FileNotFound(src)
 
     # Check that dst path exists and is writeable
-    dst_path = os.path.dirname(dst)
-    if not os.path.exists(dst_path) and os.access(dst_path, os.W_OK):
+    dst_path = os.path.dirname(dst) or '.'
+    if not os.path.exists(dst_path) or not os.access(dst_path, os.W_OK):
         raise errors.PathNotFound(dst_path)
 
-    shutil.copy2(src, dst)
+    tmp = os.path.join(dst_path, f'.{os.path.basename(dst)}.partial-{os.getpid()}')
+
+    start = time.time()
+    try:
+        with open(src, 'rb') as fsrc, open(tmp, 'wb') as fdst:
+            nbytes = _kernel_copy(fsrc, fdst)
+            os.fsync(fdst.fileno())
+        shutil.copystat(src, tmp)
+
+        size = os.stat(src).st_size
+        if nbytes != size:
+            msg = f'safe_copy: copied {nbytes} of {size} bytes of {src} to {dst}'
+            raise errors.IncompleteCopy(msg)
+
+        if checksum and file_checksum(src, checksum) != file_checksum(tmp, checksum):
+            msg = f'safe_copy: {checksum} checksum of {dst} does not match {src}'
+            raise errors.ChecksumMismatch(msg)
+
+        os.replace(tmp, dst)
+
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    elapsed = max(time.time() - start, 1e-6)
+    print(f'Copied {nbytes / 1e6:.1f} MB to {dst} in {elapsed:.2f} s '
+          f'({nbytes / 1e6 / elapsed:.1f} MB/s)')
+
+    return nbytes
+
+
+def _kernel_copy(fsrc, fdst, chunk=COPY_CHUNK):
+
+    '''
+    Copies the open file fsrc to fdst in chunks without passing the data
+    through user space, falling back to sendfile, and then to a buffered
+    copy, when the faster calls are not supported. Returns bytes copied.
+    '''
+
+    size = os.fstat(fsrc.fileno()).st_size
+    infd, outfd = fsrc.fileno(), fdst.fileno()
+
+    for call in ('copy_file_range', 'sendfile'):
+        if not hasattr(os, call):
+            continue
+        try:
+            offset = 0
+            while offset < size:
+                if call == 'copy_file_range':
+                    sent = os.copy_file_range(infd, outfd, min(chunk, size - offset))
+                else:
+                    sent = os.sendfile(outfd, infd, offset, min(chunk, size - offset))
+                if sent == 0:
+                    break
+                offset += sent
+        except OSError as err:
+            # Only fall back if nothing was written yet, e.g. for a copy
+            # across file systems with an older kernel.
+            if offset or err.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL,
+                                           errno.EOPNOTSUPP, errno.ENOTSUP):
+                raise
+            continue
+
+        if offset == size:
+            return offset
+
+        # A call that copies nothing at all, as copy_file_range does on some
+        # file systems, falls back to the next one. Stopping part way through
+        # means src changed underneath the copy.
+        if offset:
+            msg = (f'_kernel_copy: {call} stopped after {offset} of {size} '
+                   f'bytes of {fsrc.name}')
+            raise errors.IncompleteCopy(msg)
+
+    shutil.copyfileobj(fsrc, fdst, chunk)
+    return fdst.tell()
+
+
+def file_checksum(path, algorithm):
+
+    ''' Returns the hex digest of the file at path with a hashlib algorithm. '''
+
+    digest = hashlib.new(algorithm)
+    with open(path, 'rb') as fn:
+        for block in iter(lambda: fn.read(COPY_CHUNK), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def copy_files(files, workers=4, checksum=None):
+
+    '''
+    Copies each (src, dst) pair in files with safe_copy, running up to
+    workers copies at once. Reports the total throughput.
+    '''
+
+    if not files:
+        return
+
+    start = time.time()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(safe_copy, src, dst, checksum) for src, dst in files]
+        nbytes = sum(future.result() for future in futures)
+
+    elapsed = max(time.time() - start, 1e-6)
+    print(f'Copied {len(files)} files, {nbytes / 1e6:.1f} MB in {elapsed:.2f} s '
+          f'({nbytes / 1e6 / elapsed:.1f} MB/s)')
 
 
 def safe_link(src, dst):
@@ -42,8 +179,8 @@ def safe_link(src, dst):
         raise errors.FileNotFound(src)
 
     # Check that dst path exists and is writeable
-    dst_path = os.path.dirname(dst)
-    if not os.path.exists(dst_path) and os.access(dst_path, os.W_OK):
+    dst_path = os.path.dirname(dst) or '.'
+    if not os.path.exists(dst_path) or not os.access(dst_path, os.W_OK):
         raise errors.PathNotFound(dst_path)
 
     os.symlink(src, dst)
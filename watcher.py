@@ -0,0 +1,224 @@
+# pylint: disable=invalid-name
+
+from concurrent.futures import ThreadPoolExecutor
+import glob
+import os
+import re
+import shlex
+import subprocess
+import threading
+
+import preflight
+
+
+class OutputWatcher():
+
+    '''
+    Watches a forecast working directory for completed history files and hands
+    each one to a post-processing command on a bounded pool of workers.
+
+    A file is considered complete when the optional completion marker written
+    by the model exists, or when its size has not changed for stable_polls
+    consecutive polls and, for NetCDF files, its header is consistent with its
+    size. Each file whose command succeeds is appended to the
+    record file, which is kept outside the workdir so that it survives the
+    workdir being recreated, and a restarted watcher skips those files. Files
+    whose command failed are left out of the record, so a restart retries them.
+
+    When the model is relaunched from a restart set, discard_after removes the
+    files a failed attempt wrote beyond the restart time, so that the ones the
+    relaunched model writes are post-processed instead.
+    '''
+
+    def __init__(self, workdir, patterns, command, record, **kwargs):
+
+        self.workdir = workdir
+        self.patterns = patterns
+        self.command = command
+
+        self.marker = kwargs.get('marker')
+        self.max_workers = kwargs.get('max_workers', 2)
+        self.poll_interval = kwargs.get('poll_interval', 30)
+        self.stable_polls = kwargs.get('stable_polls', 2)
+        self.fmt_vars = kwargs.get('fmt_vars', {})
+
+        self.record = record
+        self.dispatched = self.load_record()
+
+        self._sizes = {}
+        self._discards = {}
+        self._futures = []
+        self._lock = threading.Lock()
+        self._pool = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load_record(self):
+
+        ''' Returns the set of files post-processed by any previous watcher. '''
+
+        if not os.path.exists(self.record):
+            return set()
+
+        with open(self.record, 'r') as fn:
+            return {line.strip() for line in fn if line.strip()}
+
+    def start(self):
+
+        ''' Start polling the workdir in a background thread. '''
+
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    def stop(self, final=True):
+
+        '''
+        Stop polling and wait for all dispatched commands to finish. With
+        final=True, the model is known to have finished cleanly, so every
+        remaining output file is dispatched without waiting for it to settle.
+        Returns the list of (path, return code) for this watcher's commands.
+        '''
+
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+        if final:
+            self.poll(final=True)
+
+        self._pool.shutdown(wait=True)
+
+        return [future.result() for _, future in self._futures]
+
+    def _watch(self):
+
+        while not self._stop.wait(self.poll_interval):
+            self.poll()
+
+    def poll(self, final=False):
+
+        ''' Dispatch each output file that has completed since the last poll. '''
+
+        with self._lock:
+            for path in self.output_files():
+                if path in self.dispatched:
+                    continue
+                if final or self.is_complete(path):
+                    self.dispatch(path)
+
+    def discard_after(self, hour):
+
+        '''
+        Remove the output files for forecast hours later than hour, along with
+        their markers, and forget that they were seen or post-processed. Any
+        command still running for one of them is neither recorded nor reported.
+        Returns the list of files removed.
+        '''
+
+        with self._lock:
+            stale = [path for path in self.output_files()
+                     if self.forecast_hour(path) and int(self.forecast_hour(path)) > hour]
+
+            for path in stale:
+                print(f'Removing {path} written after the restart time')
+                os.remove(path)
+                if self.marker:
+                    marker = os.path.join(self.workdir,
+                                          self.marker.format(fhr=self.forecast_hour(path)))
+                    if os.path.exists(marker):
+                        os.remove(marker)
+
+                self.dispatched.discard(path)
+                self._sizes.pop(path, None)
+                self._discards[path] = self._discards.get(path, 0) + 1
+
+            self._futures = [(path, future) for path, future in self._futures
+                             if path not in stale]
+
+            recorded = self.load_record()
+            if recorded & set(stale):
+                tmp = f'{self.record}.tmp'
+                with open(tmp, 'w') as fn:
+                    fn.writelines(f'{path}\n' for path in sorted(recorded - set(stale)))
+                os.replace(tmp, self.record)
+
+        return stale
+
+    def output_files(self):
+
+        ''' Returns a sorted list of files in the workdir matching patterns. '''
+
+        files = set()
+        for pattern in self.patterns:
+            files.update(glob.glob(os.path.join(self.workdir, pattern)))
+        return sorted(files)
+
+    @staticmethod
+    def forecast_hour(path):
+
+        ''' Returns the forecast hour string from names like dynf006.nc. '''
+
+        match = re.search(r'f(\d{3,})', os.path.basename(path))
+        return match.group(1) if match else ''
+
+    def is_complete(self, path):
+
+        if self.marker:
+            marker = self.marker.format(fhr=self.forecast_hour(path))
+            return os.path.exists(os.path.join(self.workdir, marker))
+
+        size = os.path.getsize(path)
+        last_size, count = self._sizes.get(path, (None, 0))
+        count = count + 1 if size == last_size else 0
+        self._sizes[path] = (size, count)
+
+        if count < self.stable_polls:
+            return False
+
+        return not (path.endswith('.nc') and preflight.check_file(path))
+
+    def dispatch(self, path):
+
+        ''' Submit the post-processing command for path. '''
+
+        cmd = self.command.format(
+            path=path,
+            fhr=self.forecast_hour(path),
+            workdir=self.workdir,
+            **self.fmt_vars,
+            )
+
+        # Only this process's in-memory set is updated here; the record is
+        # written once the command succeeds.
+        self.dispatched.add(path)
+
+        print(f'Post-processing {path}: {cmd}')
+        future = self._pool.submit(self._run, path, cmd, self._discards.get(path, 0))
+        self._futures.append((path, future))
+
+    def _run(self, path, cmd, discards):
+
+        # A command that cannot be started is reported like the shell does,
+        # with return code 127, rather than raised from stop().
+        try:
+            returncode = subprocess.run(shlex.split(cmd), check=False).returncode
+        except OSError as err:
+            print(f'Post-processing {path} could not run {cmd}: {err}')
+            return path, 127
+
+        if returncode != 0:
+            print(f'Post-processing {path} failed with return code {returncode}')
+            return path, returncode
+
+        with self._lock:
+            # The file was removed by discard_after while the command ran
+            if self._discards.get(path, 0) != discards:
+                return path, returncode
+
+            with open(self.record, 'a') as fn:
+                fn.write(f'{path}\n')
+                fn.flush()
+                os.fsync(fn.fileno())
+
+        return path, returncode